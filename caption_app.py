@@ -1,21 +1,19 @@
-import anthropic
-import base64
 import csv
 import subprocess
 import threading
 import tkinter as tk
-from tkinter import filedialog, scrolledtext, simpledialog
+from tkinter import filedialog, messagebox, scrolledtext, simpledialog
 from pathlib import Path
 from datetime import datetime
 import os
 import random
 from dotenv import load_dotenv
 
+import providers
+import text_gate
+
 # Load .env file from same directory as script
 load_dotenv(Path(__file__).parent / ".env")
-API_KEY = os.environ.get("ANTHROPIC_API_KEY", "")
-
-MODEL = "claude-sonnet-4-5-20250929"
 
 # Load caption rules and examples
 def load_caption_rules():
@@ -196,7 +194,7 @@ class CaptionApp:
 
             # Step 2: OCR and rewrite
             self.root.after(0, lambda: self.log_msg("--- Processing captions ---"))
-            client = anthropic.Anthropic(api_key=API_KEY)
+            router = providers.build_router()
             results = []
 
             for i, img_file in enumerate(screenshot_files):
@@ -204,21 +202,13 @@ class CaptionApp:
                 self.root.after(0, lambda f=img_file.name: self.log_msg(f"[{f}] Extracting..."))
 
                 try:
-                    with open(img_file, 'rb') as image:
-                        image_data = base64.standard_b64encode(image.read()).decode('utf-8')
-
-                    message = client.messages.create(
-                        model=MODEL,
-                        max_tokens=1024,
-                        messages=[{
-                            "role": "user",
-                            "content": [
-                                {"type": "image", "source": {"type": "base64", "media_type": "image/jpeg", "data": image_data}},
-                                {"type": "text", "text": "Extract all the text visible in this image. Just give me the text, nothing else."}
-                            ],
-                        }],
-                    )
-                    original_text = message.content[0].text.strip()
+                    # Skip the API entirely for frames with no overlay text
+                    if not text_gate.has_text(img_file):
+                        self.root.after(0, lambda f=img_file.name: self.log_msg(f"[{f}] No text, skipped"))
+                        results.append((img_file.stem, text_gate.NO_TEXT, ""))
+                        continue
+
+                    original_text = router.ocr(img_file, "Extract all the text visible in this image. Just give me the text, nothing else.")
                     self.root.after(0, lambda f=img_file.name: self.log_msg(f"[{f}] Generating post caption..."))
 
                     # Build the prompt with rules and examples
@@ -229,16 +219,8 @@ class CaptionApp:
                         onscreen_text=original_text
                     )
 
-                    rewrite_msg = client.messages.create(
-                        model=MODEL,
-                        max_tokens=1024,
-                        messages=[{
-                            "role": "user",
-                            "content": prompt
-                        }],
-                    )
                     # Ensure lowercase output
-                    rewritten_text = rewrite_msg.content[0].text.strip().lower()
+                    rewritten_text = router.complete(prompt).lower()
                     self.root.after(0, lambda f=img_file.name: self.log_msg(f"[{f}] Done"))
 
                     results.append((img_file.stem, original_text, rewritten_text))
@@ -263,6 +245,9 @@ class CaptionApp:
                 for filename, original, rewritten in results:
                     writer.writerow([filename, original, rewritten])
 
+            for line in router.stats_report():
+                self.root.after(0, lambda line=line: self.log_msg(line))
+
             self.root.after(0, lambda: self.log_msg(f"\n--- Done! ---"))
             self.root.after(0, lambda: self.log_msg(f"Results saved to: {run_folder}"))
             self.root.after(0, lambda: self.update_progress("Complete!"))
@@ -279,13 +264,22 @@ class CaptionApp:
 
 
 if __name__ == "__main__":
-    global API_KEY
-    if not API_KEY:
+    errors = providers.route_errors() + text_gate.config_errors()
+    if errors:
+        root = tk.Tk()
+        root.withdraw()
+        messagebox.showerror("Config", "\n".join(errors))
+        exit()
+
+    missing = providers.missing_keys()
+    if missing:
         root = tk.Tk()
         root.withdraw()
-        API_KEY = simpledialog.askstring("API Key", "Enter your Anthropic API key:", show='*')
-        if not API_KEY:
-            exit()
+        for key_var in missing:
+            api_key = simpledialog.askstring("API Key", f"Enter your {key_var}:", show='*')
+            if not api_key:
+                exit()
+            os.environ[key_var] = api_key
         root.destroy()
 
     root = tk.Tk()
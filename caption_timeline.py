@@ -0,0 +1,246 @@
+"""
+Caption Timeline Extraction
+
+Finds the segments of a video where the overlay text stays the same, so only
+one frame per distinct caption has to be sent for OCR.
+
+Each video is decoded once as a low-resolution grayscale stream and turned
+into edge maps with NumPy. Only edges whose pixels hold still over a short
+window are kept, so moving background drops out and the overlay text remains.
+The rows holding those stable edges are found per video and grouped into
+caption lines, and a new segment starts where the stable edges of any line
+before and after a frame stop matching.
+"""
+
+import subprocess
+from pathlib import Path
+
+import numpy as np
+
+# Decode settings for the differencing stream
+SAMPLE_FPS = 4
+SAMPLE_WIDTH = 160
+
+# Vertical slice of the frame (as fractions of height) searched for caption rows
+CAPTION_BAND = (0.10, 0.90)
+
+# Horizontal gradient above this counts as a text edge (0-255 scale)
+EDGE_THRESHOLD = 40
+
+# Pixels must hold still for this long to count as overlay text
+STABLE_SECONDS = 0.5
+
+# Max intensity swing (0-255) for a pixel to count as still
+STILL_TOLERANCE = 12
+
+# Fraction of a row's pixels that must be stable edges for it to hold text
+ROW_EDGE_DENSITY = 0.06
+
+# Share of caption edges that differ before/after a frame to count as a change
+CHANGE_THRESHOLD = 0.3
+
+# Fewer stable edge pixels than this is treated as "no caption"
+MIN_EDGE_PIXELS = 60
+
+# Segments shorter than this (seconds) are dropped from the timeline
+MIN_SEGMENT_SECONDS = 0.5
+
+
+def probe_size(video_path):
+    """Return (width, height) of the first video stream"""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=width,height",
+        "-of", "csv=p=0:s=x",
+        str(video_path)
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0 or "x" not in result.stdout:
+        raise RuntimeError(f"ffprobe failed: {result.stderr.strip()}")
+    width, height = result.stdout.strip().splitlines()[0].split("x")
+    return int(width), int(height)
+
+
+def decode_gray_frames(video_path, fps=SAMPLE_FPS, width=SAMPLE_WIDTH):
+    """Decode a video to a (frames, height, width) uint8 grayscale array"""
+    src_w, src_h = probe_size(video_path)
+    # Keep aspect ratio, even height for the scaler
+    height = max(2, int(round(src_h * width / src_w / 2)) * 2)
+
+    cmd = [
+        "ffmpeg", "-i", str(video_path),
+        "-vf", f"fps={fps},scale={width}:{height},format=gray",
+        "-f", "rawvideo", "-pix_fmt", "gray",
+        "pipe:1",
+        "-loglevel", "error"
+    ]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg decode failed: {result.stderr.decode(errors='replace').strip()}")
+
+    frame_size = width * height
+    count = len(result.stdout) // frame_size
+    frames = np.frombuffer(result.stdout[:count * frame_size], dtype=np.uint8)
+    return frames.reshape(count, height, width)
+
+
+def caption_region(frames, band=CAPTION_BAND):
+    """Crop the caption band out of every frame"""
+    height = frames.shape[1]
+    top = int(height * band[0])
+    bottom = max(top + 1, int(height * band[1]))
+    return frames[:, top:bottom, :]
+
+
+def stable_edges(frames, window, edge_threshold=EDGE_THRESHOLD, tolerance=STILL_TOLERANCE):
+    """
+    Edge maps of what stays still over each run of `window` frames.
+
+    Entry s covers frames s .. s + window - 1. A pixel pair counts as an edge
+    only if both pixels barely change over the window and differ strongly from
+    each other. Moving background always changes under a strong edge, so only
+    overlay text and truly static scenery survive.
+
+    Returns (edges, known): `known` marks pixel pairs that held still, so a
+    missing edge there really means "no edge" rather than "changing".
+    """
+    runs = np.lib.stride_tricks.sliding_window_view(frames, window, axis=0)
+    still = (runs.max(axis=-1) - runs.min(axis=-1)) <= tolerance
+    known = still[:, :, 1:] & still[:, :, :-1]
+    # Window sums in int32 instead of a float mean keep memory at 4 bytes a pixel
+    totals = runs.sum(axis=-1, dtype=np.int32)
+    # Overlay text has sharp vertical strokes, so a horizontal gradient is enough
+    edges = np.abs(np.diff(totals, axis=2)) > edge_threshold * window
+    return edges & known, known
+
+
+def text_rows(stable, row_density=ROW_EDGE_DENSITY):
+    """Rows that hold stable text edges at some point in the video"""
+    return stable.mean(axis=2).max(axis=0) >= row_density
+
+
+def text_lines(rows):
+    """Split a text-row mask into runs of adjacent rows, one per caption line"""
+    index = np.flatnonzero(rows)
+    return np.split(index, np.flatnonzero(np.diff(index) > 1) + 1) if len(index) else []
+
+
+def change_scores(stable, window, min_pixels=MIN_EDGE_PIXELS):
+    """
+    How much the stable caption edges differ across each frame boundary (0-1).
+
+    Entry i compares the window ending at frame window + i with the window
+    starting there. Each caption line is scored as the share of its edges
+    present on only one side, and the boundary takes the highest line score,
+    so a change to one line of a multi-line caption counts as fully as a
+    whole new caption.
+    """
+    if len(stable) <= window:
+        return np.zeros(0)
+    scores = np.zeros(len(stable) - window)
+    for line in text_lines(text_rows(stable)):
+        behind, ahead = stable[:-window, line], stable[window:, line]
+        changed = (behind ^ ahead).reshape(len(behind), -1).sum(axis=1)
+        union = (behind | ahead).reshape(len(behind), -1).sum(axis=1)
+        scores = np.maximum(scores, changed / np.maximum(union, min_pixels))
+    return scores
+
+
+def find_segments(frames, fps=SAMPLE_FPS, change_threshold=CHANGE_THRESHOLD,
+                  min_seconds=MIN_SEGMENT_SECONDS, band=CAPTION_BAND):
+    """
+    Split a grayscale frame stack into segments of stable caption text.
+
+    Returns a list of (start_frame, end_frame) pairs, end exclusive. Segments
+    shorter than `min_seconds` are dropped, so the list can have gaps.
+    """
+    total = len(frames)
+    if total == 0:
+        return []
+
+    window = max(1, int(round(STABLE_SECONDS * fps)))
+    if total < 2 * window:
+        return [(0, total)]
+    region = caption_region(frames, band=band)
+    stable, known = stable_edges(region, window)
+    # Moving scenery now and then holds still for one window by chance; those
+    # edges rarely last into the next, while caption edges always do
+    lasting = np.zeros_like(stable)
+    lasting[1:] |= stable[:-1]
+    lasting[:-1] |= stable[1:]
+    stable &= lasting
+    scores = change_scores(stable, window)
+
+    # Per-frame edge flips in the caption rows, to place a cut exactly when
+    # only text appearing (or only text vanishing) ties neighbouring windows
+    rows = text_rows(stable)
+    edges = np.abs(np.diff(region[:, rows].astype(np.int16), axis=2)) > EDGE_THRESHOLD
+    flips = (edges[1:] ^ edges[:-1]).reshape(total - 1, -1).sum(axis=1)
+
+    # Still caption pixels on both sides of each boundary. Windows that
+    # straddle a change lose the changed strokes, so they score high too
+    # (sometimes higher than the real boundary, e.g. when one line of several
+    # changes); only the real boundary has both sides fully still.
+    still = known[:, rows].reshape(len(known), -1).sum(axis=1)
+    settled = still[:-window] + still[window:]
+
+    # A change raises every boundary within window - 1 of it; cut once, at
+    # the most settled of those that still show the change
+    cuts = set()
+    for i in np.flatnonzero(scores > change_threshold):
+        lo, hi = max(0, i - window + 1), min(len(scores), i + window)
+        near = [j for j in range(lo, hi) if scores[j] >= scores[i] / 2]
+        best = max(near, key=lambda j: (settled[j], flips[j + window - 1]))
+        cuts.add(int(best) + window)
+
+    # Keep every cut; a segment too short to matter is dropped, not merged
+    min_frames = max(1, int(round(min_seconds * fps)))
+    bounds = [0] + sorted(cuts) + [total]
+    segments = [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b - a >= min_frames]
+    return segments or [(0, total)]
+
+
+def extract_frame(video_path, seconds, output_path):
+    """Save a full-resolution frame at the given timestamp"""
+    cmd = [
+        "ffmpeg", "-ss", f"{seconds:.3f}",
+        "-i", str(video_path),
+        "-vframes", "1",
+        str(output_path),
+        "-y", "-loglevel", "error"
+    ]
+    subprocess.run(cmd, capture_output=True, text=True)
+    return Path(output_path).exists()
+
+
+def build_timeline(video_path, frames_folder, ocr, fps=SAMPLE_FPS,
+                   change_threshold=CHANGE_THRESHOLD, min_seconds=MIN_SEGMENT_SECONDS):
+    """
+    Build the caption timeline for one video.
+
+    `ocr` is called with the path of one representative frame per segment and
+    must return the extracted text. Adjacent segments with identical text are
+    merged. Returns a list of (start, end, text) rows with times in seconds.
+    """
+    video_path = Path(video_path)
+    frames = decode_gray_frames(video_path, fps=fps)
+    segments = find_segments(frames, fps=fps, change_threshold=change_threshold,
+                             min_seconds=min_seconds)
+
+    rows = []
+    for n, (start, end) in enumerate(segments):
+        # Middle of the segment is least likely to catch a transition
+        middle = (start + end - 1) / 2 / fps
+        frame_path = Path(frames_folder) / f"{video_path.stem}_{n:03d}.jpg"
+        if not extract_frame(video_path, middle, frame_path):
+            continue
+
+        text = ocr(frame_path)
+        start_s, end_s = start / fps, end / fps
+        if rows and rows[-1][2] == text:
+            rows[-1] = (rows[-1][0], end_s, text)
+        else:
+            rows.append((start_s, end_s, text))
+
+    return rows
@@ -1,18 +1,16 @@
-import anthropic
-import base64
 import csv
 import subprocess
 import sys
-import os
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
 
+import caption_timeline
+import providers
+import text_gate
+
 # Load .env file from same directory as script
 load_dotenv(Path(__file__).parent / ".env")
-API_KEY = os.environ.get("ANTHROPIC_API_KEY", "")
-
-MODEL = "claude-sonnet-4-5-20250929"
 
 REWRITE_PROMPT = """Rewrite this caption. Rules:
 - Keep the same meaning/concept
@@ -26,18 +24,86 @@ REWRITE_PROMPT = """Rewrite this caption. Rules:
 Original:
 {text}"""
 
+OCR_PROMPT = "Extract all the text visible in this image. Just give me the text, nothing else."
+
+
+def ocr_image(router, img_file):
+    """Send one screenshot to a vision provider and return the extracted text"""
+    return router.ocr(img_file, OCR_PROMPT)
+
+
+def print_provider_stats(router):
+    print("\n--- Provider stats ---", flush=True)
+    for line in router.stats_report():
+        print(f"    {line}", flush=True)
+
+
+def run_timeline(router, mp4_files, run_folder):
+    """Write a (start, end, text) caption timeline for every video"""
+    frames_folder = run_folder / "timeline_frames"
+    frames_folder.mkdir(parents=True, exist_ok=True)
+    output_csv = run_folder / "timeline.csv"
+
+    print("\n--- Building caption timelines ---", flush=True)
+    rows = []
+    api_calls = 0
+
+    def ocr(frame_path):
+        nonlocal api_calls
+        if not text_gate.has_text(frame_path):
+            return text_gate.NO_TEXT
+        api_calls += 1
+        return ocr_image(router, frame_path)
+
+    for i, mp4_file in enumerate(mp4_files):
+        print(f"[{i+1}/{len(mp4_files)}] {mp4_file.name}", flush=True)
+        try:
+            timeline = caption_timeline.build_timeline(mp4_file, frames_folder, ocr)
+            for start, end, text in timeline:
+                rows.append((mp4_file.stem, f"{start:.2f}", f"{end:.2f}", text))
+            print(f"    {len(timeline)} captions", flush=True)
+        except Exception as e:
+            rows.append((mp4_file.stem, "", "", f"ERROR: {e}"))
+            print(f"    ERROR: {e}", flush=True)
+
+    with open(output_csv, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["filename", "start", "end", "text"])
+        writer.writerows(rows)
+
+    print(f"\nOCR calls: {api_calls}", flush=True)
+    print_provider_stats(router)
+    print(f"Done!", flush=True)
+    print(f"Results: {run_folder}", flush=True)
+
+
 def main():
-    if not API_KEY:
-        print("Error: ANTHROPIC_API_KEY environment variable not set")
+    errors = providers.route_errors() + text_gate.config_errors()
+    for error in errors:
+        print(f"Error: {error}")
+    if errors:
+        sys.exit(1)
+
+    missing = providers.missing_keys()
+    if missing:
+        print(f"Error: {', '.join(missing)} environment variable not set")
+        sys.exit(1)
+
+    try:
+        router = providers.build_router()
+    except (ValueError, ImportError) as e:
+        print(f"Error: {e}")
         sys.exit(1)
 
     # Get video folder from command line
-    if len(sys.argv) < 2:
-        print("Usage: python extract_captions.py <video_folder>")
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    timeline_mode = "--timeline" in sys.argv[1:]
+    if not args:
+        print("Usage: python extract_captions.py <video_folder> [--timeline]")
         print("Example: python extract_captions.py C:\\Users\\asus\\Desktop\\videos")
         sys.exit(1)
 
-    video_folder = Path(sys.argv[1])
+    video_folder = Path(args[0])
     if not video_folder.exists():
         print(f"Error: Folder not found: {video_folder}")
         sys.exit(1)
@@ -62,6 +128,10 @@ def main():
 
     print(f"Output folder: {run_folder}", flush=True)
 
+    if timeline_mode:
+        run_timeline(router, mp4_files, run_folder)
+        return
+
     # Step 1: Extract screenshots from all videos
     print("\n--- Extracting screenshots ---", flush=True)
     screenshot_files = []
@@ -88,41 +158,24 @@ def main():
 
     # Step 2: OCR and rewrite each screenshot
     print("\n--- Processing captions ---", flush=True)
-    client = anthropic.Anthropic(api_key=API_KEY)
     results = []
 
     for i, img_file in enumerate(screenshot_files):
         print(f"[{i+1}/{len(screenshot_files)}] {img_file.name}", flush=True)
 
         try:
+            # Skip the API entirely for frames with no overlay text
+            if not text_gate.has_text(img_file):
+                results.append((img_file.stem, text_gate.NO_TEXT, ""))
+                print(f"    No text, skipped", flush=True)
+                continue
+
             # OCR: Extract text from image
-            with open(img_file, 'rb') as image:
-                image_data = base64.standard_b64encode(image.read()).decode('utf-8')
-
-            message = client.messages.create(
-                model=MODEL,
-                max_tokens=1024,
-                messages=[{
-                    "role": "user",
-                    "content": [
-                        {"type": "image", "source": {"type": "base64", "media_type": "image/jpeg", "data": image_data}},
-                        {"type": "text", "text": "Extract all the text visible in this image. Just give me the text, nothing else."}
-                    ],
-                }],
-            )
-            original_text = message.content[0].text.strip()
+            original_text = ocr_image(router, img_file)
             print(f"    Extracted", flush=True)
 
             # Rewrite the caption
-            rewrite_msg = client.messages.create(
-                model=MODEL,
-                max_tokens=1024,
-                messages=[{
-                    "role": "user",
-                    "content": REWRITE_PROMPT.format(text=original_text)
-                }],
-            )
-            rewritten_text = rewrite_msg.content[0].text.strip()
+            rewritten_text = router.complete(REWRITE_PROMPT.format(text=original_text))
             print(f"    Rewritten", flush=True)
 
             results.append((img_file.stem, original_text, rewritten_text))
@@ -145,6 +198,7 @@ def main():
         for filename, original, rewritten in results:
             writer.writerow([filename, original, rewritten])
 
+    print_provider_stats(router)
     print(f"\nDone!", flush=True)
     print(f"Results: {run_folder}", flush=True)
 
@@ -7,19 +7,16 @@ Generates 1000 viral-style captions for video overlays based on the
 All captions are lowercase and evenly distributed across 10 categories.
 """
 
-import anthropic
 import csv
 import os
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
 
+import providers
+
 # Load .env file
 load_dotenv(Path(__file__).parent / ".env")
-API_KEY = os.environ.get("ANTHROPIC_API_KEY", "")
-
-MODEL = "claude-sonnet-4-5-20250929"
-
 # The 10 caption categories from the rules
 CATEGORIES = [
     "fake_innocence",      # "We're just friends" also us:
@@ -141,7 +138,7 @@ def get_examples_for_category(all_examples, category):
     return random.sample(all_examples, sample_size)
 
 
-def generate_captions_for_category(client, category, count, all_examples):
+def generate_captions_for_category(router, category, count, all_examples):
     """Generate captions for a specific category"""
     examples = get_examples_for_category(all_examples, category)
     examples_text = "\n".join(examples)
@@ -153,16 +150,7 @@ def generate_captions_for_category(client, category, count, all_examples):
         count=count
     )
 
-    message = client.messages.create(
-        model=MODEL,
-        max_tokens=4096,
-        messages=[{
-            "role": "user",
-            "content": prompt
-        }]
-    )
-
-    response_text = message.content[0].text.strip()
+    response_text = router.complete(prompt, max_tokens=4096)
     # Split into individual captions and clean them
     captions = []
     for line in response_text.split('\n'):
@@ -179,15 +167,25 @@ def generate_captions_for_category(client, category, count, all_examples):
 
 
 def main():
-    if not API_KEY:
-        api_key = input("Enter your Anthropic API key: ").strip()
+    # Caption generation goes through the rewrite route
+    errors = providers.route_errors(tasks=("rewrite",))
+    for error in errors:
+        print(f"Error: {error}")
+    if errors:
+        return
+
+    for key_var in providers.missing_keys(tasks=("rewrite",)):
+        api_key = input(f"Enter your {key_var}: ").strip()
         if not api_key:
             print("API key required")
             return
-    else:
-        api_key = API_KEY
+        os.environ[key_var] = api_key
 
-    client = anthropic.Anthropic(api_key=api_key)
+    try:
+        router = providers.build_router(tasks=("rewrite",))
+    except (ValueError, ImportError) as e:
+        print(f"Error: {e}")
+        return
 
     # Load examples
     print("Loading examples...")
@@ -217,7 +215,7 @@ def main():
 
             try:
                 captions = generate_captions_for_category(
-                    client, category, batch_size, all_examples
+                    router, category, batch_size, all_examples
                 )
                 captions_by_category[category].extend(captions)
                 remaining -= len(captions)
@@ -250,6 +248,8 @@ def main():
     print(f"\n{'='*50}")
     print(f"DONE! Generated {total_generated} captions")
     print(f"Saved to: {output_file}")
+    for line in router.stats_report():
+        print(f"  {line}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,411 @@
+"""
+Model Provider Routing
+
+Sends vision-OCR and text-rewrite calls to configurable backends instead of a
+single hard-coded Anthropic client.
+
+Routing rules come from the environment (or .env), one list per task:
+
+    OCR_PROVIDERS="anthropic:50,openai:30"
+    REWRITE_PROVIDERS="groq:100,anthropic:50"
+
+Each entry is `name:rate_limit` (requests per minute). Traffic is split across
+a task's providers in proportion to their rate limits, and calls to a provider
+are spaced so it never goes over its limit. A failed call falls through to the
+next provider. A provider that fails with an API, network or rate-limit error
+is put on a short cooldown. Models can be overridden with `<NAME>_MODEL`, e.g.
+`OPENAI_MODEL`.
+
+The `stub` provider needs no key and is meant for testing routing offline.
+"""
+
+import base64
+import importlib
+import importlib.util
+import os
+import threading
+import time
+
+# Default model and OpenAI-compatible endpoint for each provider
+PROVIDER_DEFAULTS = {
+    "anthropic": {"model": "claude-sonnet-4-5-20250929", "base_url": None},
+    "openai": {"model": "gpt-4o", "base_url": None},
+    "google": {"model": "gemini-2.0-flash", "base_url": "https://generativelanguage.googleapis.com/v1beta/openai/"},
+    "mistral": {"model": "pixtral-large-latest", "base_url": "https://api.mistral.ai/v1"},
+    "groq": {"model": "meta-llama/llama-4-scout-17b-16e-instruct", "base_url": "https://api.groq.com/openai/v1"},
+    "openrouter": {"model": "anthropic/claude-sonnet-4.5", "base_url": "https://openrouter.ai/api/v1"},
+    "xai": {"model": "grok-2-vision-latest", "base_url": "https://api.x.ai/v1"},
+    "azure": {"model": "gpt-4o", "base_url": None},
+    "ollama": {"model": "llava", "base_url": "http://localhost:11434/v1"},
+}
+
+API_KEY_VARS = {
+    "anthropic": "ANTHROPIC_API_KEY",
+    "openai": "OPENAI_API_KEY",
+    "google": "GOOGLE_API_KEY",
+    "mistral": "MISTRAL_API_KEY",
+    "groq": "GROQ_API_KEY",
+    "openrouter": "OPENROUTER_API_KEY",
+    "xai": "XAI_API_KEY",
+    "azure": "AZURE_OPENAI_API_KEY",
+    "ollama": "OLLAMA_API_KEY",
+}
+
+# Used when OCR_PROVIDERS / REWRITE_PROVIDERS are not set
+DEFAULT_ROUTES = {
+    "ocr": "anthropic:50",
+    "rewrite": "anthropic:50",
+}
+
+# Seconds a provider is skipped after a failed call
+ERROR_COOLDOWN = 30
+
+
+# SDK package each provider needs
+PROVIDER_PACKAGES = {name: "openai" for name in PROVIDER_DEFAULTS}
+PROVIDER_PACKAGES["anthropic"] = "anthropic"
+
+
+def _load_image(image_path):
+    with open(image_path, 'rb') as image:
+        return base64.standard_b64encode(image.read()).decode('utf-8')
+
+
+class ProviderError(RuntimeError):
+    """API, network or rate-limit failure from a backend"""
+
+
+def provider_error_types():
+    """Exceptions that mean the backend itself failed and should cool down"""
+    types = [ProviderError, ConnectionError, TimeoutError]
+    for package in ("anthropic", "openai"):
+        try:
+            types.append(importlib.import_module(package).APIError)
+        except ImportError:
+            pass
+    return tuple(types)
+
+
+class ProviderStats:
+    """Running call, error and latency counters for one provider"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.last_error = ""
+
+    def record(self, latency, error=None):
+        self.calls += 1
+        self.total_latency += latency
+        if error is not None:
+            self.errors += 1
+            self.last_error = str(error)
+
+    @property
+    def avg_latency(self):
+        return self.total_latency / self.calls if self.calls else 0.0
+
+    @property
+    def error_rate(self):
+        return self.errors / self.calls if self.calls else 0.0
+
+
+class Provider:
+    """Base class: one backend that can OCR an image and complete a prompt"""
+
+    def __init__(self, name, model):
+        self.name = name
+        self.model = model
+
+    def ocr(self, image_data, prompt, max_tokens=1024):
+        """OCR a base64-encoded JPEG"""
+        raise NotImplementedError
+
+    def complete(self, prompt, max_tokens=1024):
+        raise NotImplementedError
+
+
+class AnthropicProvider(Provider):
+    def __init__(self, name, model, api_key):
+        super().__init__(name, model)
+        import anthropic
+        self.client = anthropic.Anthropic(api_key=api_key)
+
+    def _create(self, content, max_tokens):
+        message = self.client.messages.create(
+            model=self.model,
+            max_tokens=max_tokens,
+            messages=[{"role": "user", "content": content}],
+        )
+        return message.content[0].text.strip()
+
+    def ocr(self, image_data, prompt, max_tokens=1024):
+        return self._create([
+            {"type": "image", "source": {"type": "base64", "media_type": "image/jpeg", "data": image_data}},
+            {"type": "text", "text": prompt}
+        ], max_tokens)
+
+    def complete(self, prompt, max_tokens=1024):
+        return self._create(prompt, max_tokens)
+
+
+class OpenAICompatibleProvider(Provider):
+    """OpenAI, Azure and every backend exposing an OpenAI-style chat endpoint"""
+
+    def __init__(self, name, model, api_key, base_url=None):
+        super().__init__(name, model)
+        import openai
+        if name == "azure":
+            self.client = openai.AzureOpenAI(
+                api_key=api_key,
+                azure_endpoint=os.environ.get("AZURE_OPENAI_ENDPOINT", ""),
+                api_version=os.environ.get("AZURE_OPENAI_API_VERSION", "2024-10-21"),
+            )
+        else:
+            self.client = openai.OpenAI(api_key=api_key, base_url=base_url)
+
+    def _create(self, content, max_tokens):
+        response = self.client.chat.completions.create(
+            model=self.model,
+            max_tokens=max_tokens,
+            messages=[{"role": "user", "content": content}],
+        )
+        return response.choices[0].message.content.strip()
+
+    def ocr(self, image_data, prompt, max_tokens=1024):
+        data_url = f"data:image/jpeg;base64,{image_data}"
+        return self._create([
+            {"type": "image_url", "image_url": {"url": data_url}},
+            {"type": "text", "text": prompt}
+        ], max_tokens)
+
+    def complete(self, prompt, max_tokens=1024):
+        return self._create(prompt, max_tokens)
+
+
+class StubProvider(Provider):
+    """
+    Local provider for testing routing without network access.
+
+    `response` is returned for every call (a callable gets the prompt or the
+    base64 image). If `fail` is an exception, it is raised on every call; if
+    it is a number, that many leading calls raise ProviderError.
+    """
+
+    def __init__(self, name="stub", model="stub", response="stub text",
+                 fail=None, latency=0.0):
+        super().__init__(name, model)
+        self.response = response
+        self.fail = fail
+        self.latency = latency
+        self.calls = 0
+
+    def _respond(self, arg):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if isinstance(self.fail, BaseException):
+            raise self.fail
+        if isinstance(self.fail, int) and self.calls <= self.fail:
+            raise ProviderError(f"{self.name}: simulated failure {self.calls}")
+        return self.response(arg) if callable(self.response) else self.response
+
+    def ocr(self, image_data, prompt, max_tokens=1024):
+        return self._respond(image_data)
+
+    def complete(self, prompt, max_tokens=1024):
+        return self._respond(prompt)
+
+
+class AllProvidersFailed(RuntimeError):
+    pass
+
+
+class Router:
+    """
+    Picks a provider per task, weighted by rate limit, with failover.
+
+    `routes` maps a task name to a list of (provider, rate_limit) pairs, the
+    limit in requests per minute. Selection uses smooth weighted round-robin,
+    so over any window each provider serves a share of a task's calls
+    proportional to its rate limit. Calls to one provider are also spaced at
+    least 60 / rate_limit seconds apart, across all tasks that use it.
+    """
+
+    def __init__(self, routes, cooldown=ERROR_COOLDOWN):
+        self.routes = routes
+        self.cooldown = cooldown
+        self.stats = {}
+        self._credit = {}
+        self._down_until = {}
+        self._next_slot = {}
+        self._lock = threading.Lock()
+        self._provider_errors = provider_error_types()
+        for task, entries in routes.items():
+            for provider, _ in entries:
+                self.stats.setdefault(provider.name, ProviderStats())
+                self._credit[(task, provider.name)] = 0.0
+
+    def _order(self, task):
+        """Ready (provider, rate) pairs for a task, best pick first, and cooled-down ones"""
+        entries = self.routes.get(task)
+        if not entries:
+            raise ValueError(f"No providers configured for task '{task}'")
+
+        with self._lock:
+            now = time.monotonic()
+            ready = [(p, rate) for p, rate in entries if self._down_until.get(p.name, 0) <= now]
+            cooling = [(p, rate) for p, rate in entries if self._down_until.get(p.name, 0) > now]
+            for p, rate in ready:
+                self._credit[(task, p.name)] += rate
+            ready.sort(key=lambda entry: (-self._credit[(task, entry[0].name)], -entry[1]))
+            return ready, cooling
+
+    def _wait_for_slot(self, provider, rate):
+        """Sleep until the provider can take another call within its rate limit"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot.get(provider.name, 0.0))
+            self._next_slot[provider.name] = start + 60.0 / rate
+        if start > now:
+            time.sleep(start - now)
+
+    def _call(self, task, method, *args, **kwargs):
+        ready, cooling = self._order(task)
+        # Credit handed out this round; whoever serves pays back what's left
+        owed = sum(rate for _, rate in ready)
+        last_error = None
+        for n, (provider, rate) in enumerate(ready + cooling):
+            self._wait_for_slot(provider, rate)
+            start = time.monotonic()
+            try:
+                result = getattr(provider, method)(*args, **kwargs)
+            except Exception as e:
+                with self._lock:
+                    self.stats[provider.name].record(time.monotonic() - start, e)
+                    # Only backend failures cool down; a bad response still fails over
+                    if isinstance(e, self._provider_errors):
+                        self._down_until[provider.name] = time.monotonic() + self.cooldown
+                    # A provider that failed sits this round out, so the split
+                    # stays proportional among the providers that are serving
+                    if n < len(ready):
+                        self._credit[(task, provider.name)] -= rate
+                        owed -= rate
+                last_error = e
+                continue
+            with self._lock:
+                self.stats[provider.name].record(time.monotonic() - start)
+                if n < len(ready):
+                    self._credit[(task, provider.name)] -= owed
+            return result
+        raise AllProvidersFailed(f"All providers failed for '{task}': {last_error}") from last_error
+
+    def ocr(self, image_path, prompt, max_tokens=1024):
+        # Read once up front so an unreadable file never counts against a provider
+        image_data = _load_image(image_path)
+        return self._call("ocr", "ocr", image_data, prompt, max_tokens=max_tokens)
+
+    def complete(self, prompt, max_tokens=1024, task="rewrite"):
+        return self._call(task, "complete", prompt, max_tokens=max_tokens)
+
+    def stats_report(self):
+        """One summary line per provider"""
+        lines = []
+        for name, s in self.stats.items():
+            line = (
+                f"{name}: {s.calls} calls, {s.errors} errors "
+                f"({s.error_rate:.0%}), avg {s.avg_latency:.2f}s"
+            )
+            if s.last_error:
+                line += f", last error: {s.last_error}"
+            lines.append(line)
+        return lines
+
+
+def parse_route(spec):
+    """Parse 'name:rate,name:rate' into [(name, rate)]"""
+    entries = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, rate = item.partition(":")
+        try:
+            rate = float(rate) if rate else 60.0
+        except ValueError:
+            raise ValueError(f"Bad rate limit in '{item}'") from None
+        if rate <= 0:
+            raise ValueError(f"Rate limit must be positive in '{item}'")
+        entries.append((name.strip().lower(), rate))
+    return entries
+
+
+def route_errors(tasks=("ocr", "rewrite")):
+    """Problems with the configured routes: bad entries, unknown names, missing packages"""
+    errors = []
+    for task in tasks:
+        var = f"{task.upper()}_PROVIDERS"
+        try:
+            entries = parse_route(os.environ.get(var, DEFAULT_ROUTES[task]))
+        except ValueError as e:
+            errors.append(f"{var}: {e}")
+            continue
+        if not entries:
+            errors.append(f"{var} has no providers")
+        for name, _ in entries:
+            if name != "stub" and name not in PROVIDER_DEFAULTS:
+                errors.append(f"{var}: unknown provider '{name}'")
+            elif name in PROVIDER_PACKAGES and importlib.util.find_spec(PROVIDER_PACKAGES[name]) is None:
+                errors.append(f"{var}: provider '{name}' needs 'pip install {PROVIDER_PACKAGES[name]}'")
+    return errors
+
+
+def create_provider(name):
+    """Instantiate a provider by name using keys and models from the environment"""
+    if name == "stub":
+        return StubProvider()
+    if name not in PROVIDER_DEFAULTS:
+        raise ValueError(f"Unknown provider: {name}")
+
+    defaults = PROVIDER_DEFAULTS[name]
+    model = os.environ.get(f"{name.upper()}_MODEL", defaults["model"])
+    api_key = os.environ.get(API_KEY_VARS[name], "")
+    # Local Ollama doesn't need a real key
+    if name == "ollama":
+        api_key = api_key or "ollama"
+    if not api_key:
+        raise ValueError(f"{API_KEY_VARS[name]} not set (needed for provider '{name}')")
+
+    if name == "anthropic":
+        return AnthropicProvider(name, model, api_key)
+    base_url = os.environ.get(f"{name.upper()}_BASE_URL", defaults["base_url"])
+    return OpenAICompatibleProvider(name, model, api_key, base_url)
+
+
+def build_router(tasks=("ocr", "rewrite")):
+    """Build a Router from OCR_PROVIDERS / REWRITE_PROVIDERS in the environment"""
+    created = {}
+    routes = {}
+    for task in tasks:
+        spec = os.environ.get(f"{task.upper()}_PROVIDERS", DEFAULT_ROUTES[task])
+        entries = []
+        for name, rate in parse_route(spec):
+            # One client per provider, shared between tasks
+            if name not in created:
+                created[name] = create_provider(name)
+            entries.append((created[name], rate))
+        routes[task] = entries
+    return Router(routes)
+
+
+def missing_keys(tasks=("ocr", "rewrite")):
+    """API key variables required by the configured routes but not set (call route_errors first)"""
+    missing = []
+    for task in tasks:
+        spec = os.environ.get(f"{task.upper()}_PROVIDERS", DEFAULT_ROUTES[task])
+        for name, _ in parse_route(spec):
+            var = API_KEY_VARS.get(name)
+            if var and name != "ollama" and not os.environ.get(var) and var not in missing:
+                missing.append(var)
+    return missing
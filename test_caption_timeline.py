@@ -0,0 +1,102 @@
+import numpy as np
+
+import caption_timeline
+
+HEIGHT, WIDTH, FRAMES = 284, 160, 40
+
+
+def draw_caption(frame, seed, right=148, top=120, left=12):
+    """White vertical strokes with dark outlines, like a one-line overlay"""
+    rng = np.random.default_rng(seed)
+    for x in range(left, right, 5):
+        if rng.random() < 0.7:
+            frame[top:top + 20, x:x + 2] = 255
+            frame[top:top + 20, x - 1] = 0
+            frame[top:top + 20, x + 2] = 0
+
+
+def panning_clip(captions):
+    """Textured background panning 2px per frame under the given caption seeds"""
+    rng = np.random.default_rng(0)
+    texture = (rng.random((HEIGHT // 4, WIDTH + 2 * FRAMES)) * 255).astype(np.uint8)
+    texture = np.repeat(texture, 4, axis=0)
+    frames = np.stack([texture[:, 2 * t:2 * t + WIDTH].copy() for t in range(FRAMES)])
+    for frame, seed in zip(frames, captions):
+        if seed is not None:
+            draw_caption(frame, seed)
+    return frames
+
+
+def static_clip(captions):
+    frames = np.full((FRAMES, HEIGHT, WIDTH), 90, dtype=np.uint8)
+    for frame, seed in zip(frames, captions):
+        if seed is not None:
+            draw_caption(frame, seed)
+    return frames
+
+
+def test_panning_background_fixed_caption_is_one_segment():
+    frames = panning_clip([1] * FRAMES)
+    assert caption_timeline.find_segments(frames) == [(0, FRAMES)]
+
+
+def test_panning_background_caption_change():
+    frames = panning_clip([1] * 20 + [2] * 20)
+    assert caption_timeline.find_segments(frames) == [(0, 20), (20, 40)]
+
+
+def test_static_background_caption_change():
+    frames = static_clip([1] * 20 + [2] * 20)
+    assert caption_timeline.find_segments(frames) == [(0, 20), (20, 40)]
+
+
+def test_partial_line_change():
+    frames = np.full((FRAMES, HEIGHT, WIDTH), 90, dtype=np.uint8)
+    for t, frame in enumerate(frames):
+        draw_caption(frame, 1, right=148 if t < 20 else 80)
+    assert caption_timeline.find_segments(frames) == [(0, 20), (20, 40)]
+
+
+def one_line_change_clip(frames, lines=2, shift=2):
+    """Multi-line caption whose second line is rewritten at frame 20"""
+    for t, frame in enumerate(frames):
+        draw_caption(frame, 0, top=90)
+        draw_caption(frame, 1, top=120, left=12 if t < 20 else 12 + shift)
+        if lines == 3:
+            draw_caption(frame, 2, top=150)
+    return frames
+
+
+def test_one_line_of_multi_line_caption_changes():
+    # Windows straddling the change lose the changed line's edges and score
+    # higher than the real boundary; that must still give one cut, in place
+    for lines in (2, 3):
+        for shift in (1, 2, 3):
+            frames = one_line_change_clip(static_clip([None] * FRAMES), lines, shift)
+            assert caption_timeline.find_segments(frames) == [(0, 20), (20, 40)]
+            frames = one_line_change_clip(panning_clip([None] * FRAMES), lines, shift)
+            assert caption_timeline.find_segments(frames) == [(0, 20), (20, 40)]
+
+
+def test_one_line_change_with_overlapping_strokes():
+    # Old and new line share most stroke positions, so the whole-caption
+    # change is small; the changed line alone must still cut
+    frames = static_clip([None] * FRAMES)
+    for t, frame in enumerate(frames):
+        draw_caption(frame, 0, top=90)
+        draw_caption(frame, 1 if t < 20 else 11, top=120)
+    assert caption_timeline.find_segments(frames) == [(0, 20), (20, 40)]
+
+
+def test_change_soon_after_cut_is_kept():
+    frames = static_clip([1] * 10 + [2] * 3 + [3] * 27)
+    assert caption_timeline.find_segments(frames) == [(0, 10), (10, 13), (13, 40)]
+
+
+def test_short_segment_is_dropped_not_merged():
+    # Caption 2 shows for a single frame: too short to OCR, but caption 3 must
+    # still get its own segment rather than being folded into caption 1
+    frames = static_clip([1] * 10 + [2] + [3] * 29)
+    first, second = caption_timeline.find_segments(frames)
+    assert first[0] == 0 and second[1] == FRAMES
+    assert first[1] in (10, 11) and second[0] == first[1]
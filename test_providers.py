@@ -0,0 +1,122 @@
+import pytest
+
+import providers
+from providers import AllProvidersFailed, ProviderError, Router, StubProvider
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record pacing waits instead of sleeping through them"""
+    waits = []
+    monkeypatch.setattr(providers.time, "sleep", waits.append)
+    return waits
+
+
+def served_by(router, calls, task="rewrite"):
+    return [router.complete("hi", task=task) for _ in range(calls)]
+
+
+def test_weighted_split(sleeps):
+    router = Router({"rewrite": [(StubProvider("a", response="a"), 50),
+                                 (StubProvider("b", response="b"), 30)]})
+    results = served_by(router, 80)
+    assert results.count("a") == 50 and results.count("b") == 30
+    # Smooth round-robin interleaves rather than serving in runs
+    assert results[:8].count("a") == 5
+
+
+def test_calls_are_paced_to_rate_limit(sleeps):
+    router = Router({"rewrite": [(StubProvider("a"), 60)]})
+    served_by(router, 3)
+    assert len(sleeps) == 2
+    assert sleeps[0] == pytest.approx(1.0, abs=0.05)
+    assert sleeps[1] == pytest.approx(2.0, abs=0.05)
+
+
+def test_failover_on_provider_error(sleeps):
+    a = StubProvider("a", response="a", fail=1)
+    router = Router({"rewrite": [(a, 50), (StubProvider("b", response="b"), 30)]})
+    assert router.complete("hi") == "b"
+    assert router.stats["a"].errors == 1 and router.stats["b"].calls == 1
+
+
+def test_cooldown_only_on_provider_errors(sleeps):
+    a = StubProvider("a", response="a", fail=1)
+    router = Router({"rewrite": [(a, 50), (StubProvider("b", response="b"), 50)]})
+    served_by(router, 4)
+    assert a.calls == 1
+
+    bad = StubProvider("bad", fail=ValueError("unparseable response"))
+    router = Router({"rewrite": [(bad, 50), (StubProvider("b", response="b"), 50)]})
+    assert served_by(router, 4) == ["b"] * 4
+    assert bad.calls == 4
+    assert "bad" not in router._down_until
+
+
+def test_fallback_keeps_split_among_serving_providers(sleeps):
+    # "a" keeps failing; its share must spread 30:20 over b and c rather
+    # than all landing on whichever fallback is listed first
+    a = StubProvider("a", fail=ValueError("bad"))
+    router = Router({"rewrite": [(a, 50), (StubProvider("b", response="b"), 30),
+                                 (StubProvider("c", response="c"), 20)]})
+    results = served_by(router, 50)
+    assert results.count("b") == 30 and results.count("c") == 20
+
+
+def test_failed_provider_is_not_charged_for_fallback(sleeps):
+    # While "a" fails every call, "b" serves alone; once "a" recovers the
+    # 50/50 split resumes straight away instead of "a" catching up in a burst
+    a = StubProvider("a", response="a", fail=ValueError("bad"))
+    router = Router({"rewrite": [(a, 50), (StubProvider("b", response="b"), 50)]})
+    served_by(router, 6)
+    a.fail = None
+    assert sorted(served_by(router, 4)) == ["a", "a", "b", "b"]
+
+
+def test_all_providers_failed(sleeps):
+    router = Router({"rewrite": [(StubProvider("a", fail=ProviderError("down")), 50),
+                                 (StubProvider("b", fail=ValueError("bad")), 50)]})
+    with pytest.raises(AllProvidersFailed):
+        router.complete("hi")
+
+
+def test_ocr_reads_image_once(sleeps, tmp_path):
+    image = tmp_path / "frame.jpg"
+    image.write_bytes(b"jpeg")
+    seen = []
+    router = Router({"ocr": [(StubProvider("a", fail=1), 50),
+                             (StubProvider("b", response=seen.append), 50)]})
+    router.ocr(image, "read it")
+    assert seen == [providers._load_image(image)]
+
+
+def test_parse_route():
+    assert providers.parse_route("Anthropic:50, openai:30,") == [("anthropic", 50.0), ("openai", 30.0)]
+    assert providers.parse_route("groq") == [("groq", 60.0)]
+    with pytest.raises(ValueError):
+        providers.parse_route("openai:fast")
+    with pytest.raises(ValueError):
+        providers.parse_route("openai:0")
+
+
+def test_route_errors(monkeypatch):
+    monkeypatch.setenv("OCR_PROVIDERS", "stub:10")
+    monkeypatch.setenv("REWRITE_PROVIDERS", "stub:10")
+    assert providers.route_errors() == []
+    monkeypatch.setenv("OCR_PROVIDERS", "nosuch:10")
+    monkeypatch.setenv("REWRITE_PROVIDERS", "stub:-1")
+    errors = providers.route_errors()
+    assert len(errors) == 2
+    assert "unknown provider 'nosuch'" in errors[0]
+    assert errors[1].startswith("REWRITE_PROVIDERS")
+    monkeypatch.setenv("OCR_PROVIDERS", " , ")
+    assert "OCR_PROVIDERS has no providers" in providers.route_errors(tasks=("ocr",))
+
+
+def test_stats_report(sleeps):
+    router = Router({"rewrite": [(StubProvider("a", fail=1), 50), (StubProvider("b"), 50)]})
+    served_by(router, 3)
+    report = dict(line.split(": ", 1) for line in router.stats_report())
+    assert report["a"].startswith("1 calls, 1 errors (100%)")
+    assert "last error: a: simulated failure 1" in report["a"]
+    assert report["b"].startswith("3 calls, 0 errors (0%)")
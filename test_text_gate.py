@@ -0,0 +1,140 @@
+import sys
+import types
+
+import numpy as np
+
+import text_gate
+
+HEIGHT, WIDTH = 568, 320
+SCALE = 4
+
+
+def draw_caption(frame, top, seed):
+    """One line of white, dark-outlined letters of mixed stroke widths"""
+    rng = np.random.default_rng(seed)
+    x = 20
+    while x < WIDTH - 30:
+        width = int(rng.integers(2, 7))
+        frame[top - 1:top + 17, x - 1:x + width + 1] = 0
+        frame[top:top + 16, x:x + width] = 255
+        x += width + int(rng.integers(4, 9))
+
+
+def plain_caption_frame(background, top, seed, fill=255):
+    """
+    Letters with no outline, drawn off the pixel grid at 4x, box-downscaled
+    and softened like a bilinear scale, so every edge is an anti-aliased
+    ramp as in a real frame scaled down to GATE_WIDTH
+    """
+    rng = np.random.default_rng(seed)
+    big = np.full((HEIGHT * SCALE, WIDTH * SCALE), background, dtype=np.float64)
+    x = 20 * SCALE + 1
+    while x < (WIDTH - 30) * SCALE:
+        width = int(rng.integers(7, 22))
+        big[top * SCALE:(top + 16) * SCALE, x:x + width] = fill
+        x += width + int(rng.integers(13, 33))
+    small = big.reshape(HEIGHT, SCALE, WIDTH, SCALE).mean(axis=(1, 3))
+    small[:, 1:-1] = (small[:, :-2] + 2 * small[:, 1:-1] + small[:, 2:]) / 4
+    return np.round(small).astype(np.uint8)
+
+
+def test_caption_scores_above_threshold():
+    for top in (100, 280, 470):
+        frame = np.full((HEIGHT, WIDTH), 110, dtype=np.uint8)
+        draw_caption(frame, top, seed=top)
+        assert text_gate.text_score(frame) >= text_gate.SUGGESTED_THRESHOLD
+
+
+def test_plain_white_caption_without_outline():
+    # The edge pixels sit on the anti-aliased ramp, not the background, so
+    # contrast has to be measured beyond them
+    for background in (110, 150):
+        for top in (100, 280, 470):
+            frame = plain_caption_frame(background, top, seed=top)
+            assert text_gate.text_score(frame) >= text_gate.SUGGESTED_THRESHOLD
+
+
+def test_dark_caption_on_light_background():
+    frame = plain_caption_frame(200, 280, seed=1, fill=20)
+    assert text_gate.text_score(frame) >= text_gate.SUGGESTED_THRESHOLD
+
+
+def test_plain_frame_scores_zero():
+    frame = np.full((HEIGHT, WIDTH), 110, dtype=np.uint8)
+    assert text_gate.text_score(frame) == 0.0
+
+
+def test_random_texture_scores_below_threshold():
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (HEIGHT, WIDTH)).astype(np.uint8)
+    assert text_gate.text_score(frame) < text_gate.SUGGESTED_THRESHOLD
+
+
+def test_gate_is_off_by_default(monkeypatch):
+    monkeypatch.delenv("TEXT_GATE_THRESHOLD", raising=False)
+    # No decode happens when the gate is off, so a missing file is fine
+    assert text_gate.has_text("missing.jpg")
+
+
+def test_empty_threshold_uses_default(monkeypatch):
+    monkeypatch.setenv("TEXT_GATE_THRESHOLD", "")
+    assert text_gate.get_threshold() == text_gate.THRESHOLD
+    monkeypatch.setenv("TEXT_GATE_THRESHOLD", "0.3")
+    assert text_gate.get_threshold() == 0.3
+
+
+def test_config_errors(monkeypatch):
+    for good in ("", "0", "0.06", " 1 "):
+        monkeypatch.setenv("TEXT_GATE_THRESHOLD", good)
+        assert text_gate.config_errors() == []
+    for bad in ("abc", "-0.1", "5", "nan"):
+        monkeypatch.setenv("TEXT_GATE_THRESHOLD", bad)
+        assert "TEXT_GATE_THRESHOLD" in text_gate.config_errors()[0]
+
+
+def labelled_folder(tmp_path):
+    for label in ("text", text_gate.NO_TEXT):
+        (tmp_path / label).mkdir()
+        for n in range(2):
+            (tmp_path / label / f"{label}_{n}.jpg").write_bytes(b"")
+    return tmp_path
+
+
+def test_evaluate_scores_tesseract_when_it_would_run(monkeypatch, tmp_path):
+    folder = labelled_folder(tmp_path)
+    monkeypatch.setenv("TEXT_GATE_OCR", "1")
+    monkeypatch.setattr(text_gate, "_local_ocr_has_text", lambda path: path.name != "text_1.jpg")
+    monkeypatch.setattr(text_gate, "load_gray", lambda path: 1 / 0)
+    lines = text_gate.evaluate(folder)
+    assert lines[0].startswith("Detector: Tesseract")
+    assert "recall 0.500" in lines[1] and "missed captions 1" in lines[1]
+
+
+def test_evaluate_says_when_tesseract_falls_back(monkeypatch, tmp_path):
+    folder = labelled_folder(tmp_path)
+    monkeypatch.setenv("TEXT_GATE_OCR", "1")
+    monkeypatch.setattr(text_gate, "_local_ocr_has_text", lambda path: None)
+    frame = np.full((HEIGHT, WIDTH), 110, dtype=np.uint8)
+    monkeypatch.setattr(text_gate, "load_gray", lambda path: frame)
+    lines = text_gate.evaluate(folder, 0.06)
+    assert lines[0].startswith("Detector: heuristic") and "unavailable" in lines[0]
+    assert "recall 0.000" in lines[1]
+
+
+def test_missing_tesseract_binary_falls_back(monkeypatch):
+    fake = types.ModuleType("pytesseract")
+
+    class TesseractNotFoundError(EnvironmentError):
+        pass
+
+    def image_to_string(image):
+        raise TesseractNotFoundError()
+
+    fake.TesseractNotFoundError = TesseractNotFoundError
+    fake.TesseractError = RuntimeError
+    fake.image_to_string = image_to_string
+    pil = types.ModuleType("PIL")
+    pil.Image = types.SimpleNamespace(open=lambda path: None)
+    monkeypatch.setitem(sys.modules, "pytesseract", fake)
+    monkeypatch.setitem(sys.modules, "PIL", pil)
+    assert text_gate._local_ocr_has_text("frame.jpg") is None
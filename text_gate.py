@@ -0,0 +1,346 @@
+"""
+Text Presence Gate
+
+Cheap local check for whether a screenshot has overlay text, run before the
+vision request so frames without a caption don't cost an API call.
+
+The default detector is CPU-only NumPy and looks at the top, centre and bottom
+strips where captions usually sit. In each strip it finds the line-high window
+with the most rows of dense, high-contrast edges, then checks that those edges
+pair up into strokes that look like lettering: bright (or dark) against the
+background just outside them, several rows tall, sharing one fill colour, with
+letter-like widths. Random texture rarely lines up like that, so it scores
+low; busy regular patterns such as foliage or stripes can still pass and just
+cost an API call. If pytesseract is installed and TEXT_GATE_OCR=1, a local
+Tesseract pass decides instead.
+
+The gate is off unless TEXT_GATE_THRESHOLD is set. Check a threshold against a
+labelled folder of your own frames (with `text/` and `no_text/` subfolders of
+JPGs) first:
+
+    python text_gate.py <labelled_folder> [threshold]
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from caption_timeline import probe_size
+
+NO_TEXT = "no_text"
+
+# Frames scoring below this are treated as having no text. Off by default;
+# set TEXT_GATE_THRESHOLD to turn the gate on
+THRESHOLD = 0.0
+
+# Starting point for TEXT_GATE_THRESHOLD: kept plain, outlined, shadowed and
+# dark captions on a labelled sample while skipping most plain frames
+SUGGESTED_THRESHOLD = 0.06
+
+GATE_WIDTH = 320
+
+# Strips of the frame (fractions of height) where overlay captions usually sit
+CAPTION_BANDS = (
+    (0.05, 0.35),
+    (0.35, 0.65),
+    (0.65, 0.95),
+)
+
+# Captions are high-contrast, so only strong gradients count as edges. The
+# change is measured across two pixels, since scaling spreads an edge over two
+EDGE_THRESHOLD = 60
+
+# Fraction of a row's pixels that must be edges for the row to look like text
+ROW_EDGE_DENSITY = 0.06
+
+# Height of the sliding window (fraction of frame height), about one text line
+LINE_HEIGHT = 0.025
+
+# Stroke widths (pixels at GATE_WIDTH) that can belong to caption lettering
+MIN_STROKE = 2
+MAX_STROKE = 12
+
+# Typical stroke-width variation (std / mean) along a line of lettering
+STROKE_CV = 0.45
+
+# Lettering strokes: peak at least this bright (or this far below 255 when
+# dark), at least STROKE_CONTRAST brighter/darker than the background just
+# outside both edges, and continuing for STROKE_HEIGHT rows
+STROKE_FILL = 170
+STROKE_CONTRAST = 60
+STROKE_HEIGHT = 5
+
+# Letters in one caption share a fill colour; strokes whose peak is within
+# this of the line's median count as matching
+FILL_TOLERANCE = 12
+
+# Lettering strokes per window row at which the count term saturates
+STROKES_PER_ROW = 6
+
+
+def load_gray(image_path, width=GATE_WIDTH):
+    """Decode an image to a (height, width) uint8 grayscale array"""
+    src_w, src_h = probe_size(image_path)
+    height = max(2, int(round(src_h * width / src_w / 2)) * 2)
+    cmd = [
+        "ffmpeg", "-i", str(image_path),
+        "-vf", f"scale={width}:{height},format=gray",
+        "-f", "rawvideo", "-pix_fmt", "gray",
+        "-vframes", "1",
+        "pipe:1",
+        "-loglevel", "error"
+    ]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0 or len(result.stdout) < width * height:
+        raise RuntimeError(f"ffmpeg decode failed: {result.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(result.stdout[:width * height], dtype=np.uint8).reshape(height, width)
+
+
+def gradient(region):
+    """Horizontal change across two pixels, so an anti-aliased edge reads as one step"""
+    return region[:, 2:] - region[:, :-2]
+
+
+def stroke_score(region):
+    """
+    How much a text-line window looks like caption lettering (0-1).
+
+    Consecutive edges of opposite sign in a row bound a stroke. A stroke
+    looks like lettering when its peak is near white (or near black for dark
+    text), it stands out from the background just beyond both edges, and it
+    carries on down the next few rows the way letter stems do. The score
+    combines how many such strokes there are, whether their widths vary no
+    more than letters do (about STROKE_CV), what share of all strokes they
+    make up, and how many share the line's fill colour. Light and dark strokes
+    are scored separately and the better one is kept.
+    """
+    height, width = region.shape
+    diff = gradient(region)
+    sign = np.where(diff > EDGE_THRESHOLD, 1, np.where(diff < -EDGE_THRESHOLD, -1, 0))
+    # A soft edge spans a couple of columns; keep only the first of each run
+    sign[:, 1:][sign[:, 1:] == sign[:, :-1]] = 0
+    rows, cols = np.nonzero(sign)
+    if len(cols) < 2:
+        return 0.0
+    signs = sign[rows, cols]
+    widths = cols[1:] - cols[:-1]
+    same_row = rows[1:] == rows[:-1]
+
+    # Column offsets covering the inside of the widest stroke
+    span = np.arange(1, MAX_STROKE + 2)
+    best = 0.0
+    for polarity in (1, -1):
+        strokes = (same_row & (signs[:-1] == polarity) & (signs[1:] == -polarity)
+                   & (widths >= MIN_STROKE) & (widths <= MAX_STROKE))
+        candidates = int(strokes.sum())
+        if candidates < 4:
+            continue
+        r, c0, c1 = rows[:-1][strokes], cols[:-1][strokes], cols[1:][strokes]
+        w = widths[strokes]
+
+        # Gradient entry c spans columns c..c+2, so c0 and c1 + 2 lie outside
+        # the stroke's edges, on the local background
+        background = np.stack([region[r, c0], region[r, c1 + 2]])
+        inside = np.minimum(c0[:, None] + span, (c1 + 1)[:, None])
+        peak = (region[r[:, None], inside] * polarity).max(axis=1) * polarity
+        if polarity == 1:
+            letter = (peak >= STROKE_FILL) & (peak - background.max(axis=0) >= STROKE_CONTRAST)
+        else:
+            letter = (peak <= 255 - STROKE_FILL) & (background.min(axis=0) - peak >= STROKE_CONTRAST)
+        r, c0, w, peak = r[letter], c0[letter], w[letter], peak[letter]
+        if len(r) < 4:
+            continue
+
+        # Stroke starts, widened by a column so slanted strokes still line up
+        starts = np.zeros((height + STROKE_HEIGHT, width + 2), dtype=bool)
+        starts[r, c0 + 1] = True
+        near = starts.copy()
+        near[:, 1:] |= starts[:, :-1]
+        near[:, :-1] |= starts[:, 1:]
+        down = np.ones(len(r), dtype=bool)
+        up = np.ones(len(r), dtype=bool)
+        for k in range(1, STROKE_HEIGHT):
+            down &= near[r + k, c0 + 1]
+            up &= near[np.maximum(r - k, 0), c0 + 1] & (r >= k)
+        tall = down | up
+        w, peak = w[tall], peak[tall]
+        if len(w) < 4:
+            continue
+
+        count_term = min(1.0, len(w) / (height * STROKES_PER_ROW))
+        # Erratic widths look like texture; very even ones (big bold letters,
+        # but also blinds) are only mildly penalised
+        cv = w.std() / w.mean()
+        spread = STROKE_CV if cv > STROKE_CV else 2 * STROKE_CV
+        width_term = max(0.0, 1 - abs(cv - STROKE_CV) / spread)
+        share_term = np.sqrt(len(w) / candidates)
+        fill_term = np.mean(np.abs(peak - np.median(peak)) <= FILL_TOLERANCE) ** 2
+        best = max(best, count_term * width_term * share_term * fill_term)
+    return float(best)
+
+
+def band_score(gray, band):
+    """Text score of the best line-high window inside one strip"""
+    height = gray.shape[0]
+    top = int(height * band[0])
+    bottom = max(top + 2, int(height * band[1]))
+    region = gray[top:bottom].astype(np.int16)
+
+    edges = np.abs(gradient(region)) > EDGE_THRESHOLD
+    # Keep edges that continue into the next row: letter strokes do, noise mostly doesn't
+    edges = edges[1:] & edges[:-1]
+    row_text = (edges.mean(axis=1) >= ROW_EDGE_DENSITY).astype(np.float64)
+
+    window = max(1, min(len(row_text), int(round(height * LINE_HEIGHT))))
+    sums = np.cumsum(np.concatenate(([0.0], row_text)))
+    coverage = (sums[window:] - sums[:-window]) / window
+
+    # Contrast of each window, so faint texture scores lower than bold captions
+    rows = region[1:]
+    row_lo = np.percentile(rows, 2, axis=1)
+    row_hi = np.percentile(rows, 98, axis=1)
+    spread = np.lib.stride_tricks.sliding_window_view(row_hi - row_lo, window).max(axis=1) / 255
+
+    # Stroke check is the costly part, so only run it on half-overlapping
+    # windows that already look like a line of text
+    line = coverage * spread
+    best = 0.0
+    for start in range(0, len(line), max(1, window // 2)):
+        if line[start] > best:
+            best = max(best, line[start] * stroke_score(rows[start:start + window]))
+    return float(best)
+
+
+def text_score(gray, bands=CAPTION_BANDS):
+    """Score 0-1 for how likely a grayscale frame holds overlay text"""
+    return max(band_score(gray, band) for band in bands)
+
+
+def _local_ocr_has_text(image_path):
+    """Tesseract verdict, or None to fall back to the heuristic"""
+    try:
+        import pytesseract
+        from PIL import Image
+    except ImportError:
+        return None
+    try:
+        text = pytesseract.image_to_string(Image.open(image_path))
+    except (pytesseract.TesseractNotFoundError, pytesseract.TesseractError):
+        # Python package present but the tesseract binary missing or broken
+        return None
+    return sum(c.isalnum() for c in text) >= 3
+
+
+def get_threshold():
+    """Gate threshold, read at call time so a .env loaded after import applies"""
+    value = os.environ.get("TEXT_GATE_THRESHOLD", "").strip()
+    return float(value) if value else THRESHOLD
+
+
+def config_errors():
+    """Problems with the gate settings in the environment, to report before a run starts"""
+    value = os.environ.get("TEXT_GATE_THRESHOLD", "").strip()
+    if not value:
+        return []
+    try:
+        threshold = float(value)
+    except ValueError:
+        threshold = None
+    if threshold is None or not 0 <= threshold <= 1:
+        return [f"TEXT_GATE_THRESHOLD must be a number from 0 to 1, got '{value}'"]
+    return []
+
+
+def has_text(image_path, threshold=None):
+    """True if the frame looks like it has overlay text worth sending for OCR"""
+    threshold = get_threshold() if threshold is None else threshold
+    if threshold <= 0:
+        return True
+    if os.environ.get("TEXT_GATE_OCR", "") == "1":
+        result = _local_ocr_has_text(image_path)
+        if result is not None:
+            return result
+    return text_score(load_gray(image_path)) >= threshold
+
+
+def evaluate(labelled_folder, threshold=None):
+    """
+    Precision/recall on a folder with text/ and no_text/ subfolders.
+
+    Scores the detector has_text would use: Tesseract when TEXT_GATE_OCR=1
+    and it runs, otherwise the heuristic at `threshold` plus a sweep.
+    """
+    threshold = get_threshold() if threshold is None else threshold
+    if threshold <= 0:
+        threshold = SUGGESTED_THRESHOLD
+    labelled_folder = Path(labelled_folder)
+
+    files = []
+    for label, positive in (("text", True), (NO_TEXT, False)):
+        for img_file in sorted((labelled_folder / label).glob('*.jpg')):
+            files.append((img_file, positive))
+
+    def report_line(name, detected):
+        tp = sum(1 for (_, pos), d in zip(files, detected) if pos and d)
+        fp = sum(1 for (_, pos), d in zip(files, detected) if not pos and d)
+        fn = sum(1 for (_, pos), d in zip(files, detected) if pos and not d)
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        skipped = sum(1 for d in detected if not d)
+        return (f"{name}: precision {precision:.3f}  recall {recall:.3f}  "
+                f"API calls skipped {skipped}/{len(files)}  missed captions {fn}")
+
+    header = "Detector: heuristic"
+    if os.environ.get("TEXT_GATE_OCR", "") == "1":
+        verdicts = [_local_ocr_has_text(f) for f, _ in files]
+        if None not in verdicts:
+            lines = ["Detector: Tesseract (TEXT_GATE_OCR=1)", report_line("Tesseract", verdicts)]
+            misses = [f"  {f.name}" for (f, pos), d in zip(files, verdicts) if pos and not d]
+            if misses:
+                lines += ["", "Text frames Tesseract missed:"] + misses
+            return lines
+        header += " (TEXT_GATE_OCR=1, but Tesseract is unavailable so the gate falls back to this)"
+
+    scores = [text_score(load_gray(f)) for f, _ in files]
+    lines = [header, report_line(f"threshold {threshold:.2f}", [s >= threshold for s in scores]),
+             "", "Sweep:"]
+    for t in np.arange(0.02, 0.42, 0.02):
+        lines.append("  " + report_line(f"threshold {t:.2f}", [s >= t for s in scores]))
+
+    misses = [f"  {f.name} ({s:.3f})" for (f, pos), s in zip(files, scores) if pos and s < threshold]
+    if misses:
+        lines += ["", "Text frames below threshold:"] + misses
+    return lines
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python text_gate.py <labelled_folder> [threshold]")
+        print("The folder must contain text/ and no_text/ subfolders of JPG frames")
+        sys.exit(1)
+
+    folder = Path(sys.argv[1])
+    if not (folder / "text").exists() or not (folder / NO_TEXT).exists():
+        print(f"Error: {folder} needs text/ and no_text/ subfolders")
+        sys.exit(1)
+
+    errors = config_errors()
+    for error in errors:
+        print(f"Error: {error}")
+    if errors:
+        sys.exit(1)
+
+    try:
+        threshold = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    except ValueError:
+        print(f"Error: threshold must be a number, got '{sys.argv[2]}'")
+        sys.exit(1)
+    for line in evaluate(folder, threshold):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()